@@ -1,18 +1,21 @@
 import os
 import sys
-from logging import getLogger
+from logging import getLogger, FileHandler
 from constant import LogSet, utility_name
 from utils.menu_print import Interactive
 from utils.tui_mode import interactive
 from utils.cli_mode import arg_settings, run_cli
 
 
-main_log = getLogger(os.path.basename(__file__).removesuffix('.py'))
-main_log.setLevel(LogSet['level'])
-if not main_log.handlers:
-    handler = LogSet['handler']
+main_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
+
+
+def setup_logging():
+    package_log = getLogger(utility_name)
+    package_log.setLevel(LogSet['level'])
+    handler = FileHandler(LogSet['file'], mode='w')
     handler.setFormatter(LogSet['formatter'])
-    main_log.addHandler(handler)
+    package_log.addHandler(handler)
 
 
 def run_is_not_in_terminal():
@@ -21,6 +24,7 @@ def run_is_not_in_terminal():
 
 
 if __name__ == '__main__':
+    setup_logging()
     if os.geteuid() != 0:
         print(f'[ERROR] {utility_name} стартовал не от root')
         main_log.error(f'{utility_name} должен запускаться от привилегированного пользователя - \"root\"')
@@ -7,11 +7,14 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 utility_name = 'InitCraft'
 utility_version = '1.0.0-beta'
 
+# Логгеры модулей — дочерние для логгера пакета `InitCraft`. Файл журнала подключает только точка входа CLI (app.py),
+# поэтому импорт модулей как библиотеки не создаёт и не очищает InitCraft.log
 LogSet = {
     'level': logging.INFO,
-    'handler': logging.FileHandler(f'{os.path.join(base_dir, utility_name)}.log', mode='w'),
+    'file': f'{os.path.join(base_dir, utility_name)}.log',
     'formatter': logging.Formatter('%(asctime)s %(name)s %(levelname)s %(message)s'),
 }
+logging.getLogger(utility_name).addHandler(logging.NullHandler())
 
 menu_items = [
     (f'Загрузить карту конфигурации env.json из корневого каталога {utility_name}', (1, 'default')),
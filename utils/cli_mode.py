@@ -1,20 +1,16 @@
 import os
 import sys
 import argparse
-from utils.editor import ConfigMaker
+from utils.editor import ConfigMaker, ConfigMapError
 from utils.backup import create_backup, rollback_mode
 from utils.os_worker import OSWorker
 from utils.converter import txt_to_json
+from utils.journal import ApplyJournal
 from logging import getLogger
-from constant import LogSet, utility_name, menu_items, utility_version
+from constant import utility_name, menu_items, utility_version
 
 
-cli_log = getLogger(os.path.basename(__file__).removesuffix('.py'))
-cli_log.setLevel(LogSet['level'])
-if not cli_log.handlers:
-    handler = LogSet['handler']
-    handler.setFormatter(LogSet['formatter'])
-    cli_log.addHandler(handler)
+cli_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
 
 
 def exit_with_error(log_message: str, message: str):
@@ -23,6 +19,13 @@ def exit_with_error(log_message: str, message: str):
     sys.exit(1)
 
 
+def load_editor(config_mode: int, config_line: str) -> ConfigMaker:
+    try:
+        return ConfigMaker(config_mode, config_line)
+    except ConfigMapError as e:
+        exit_with_error(f'карта конфигурации не загружена: {e}', f'[ERROR] {e}')
+
+
 def str2bool(value):
     if isinstance(value, bool):
         return value
@@ -43,10 +46,14 @@ def arg_settings():
                '    python3 initcraft -m 1 --apply\n'
                '    python3 initcraft --mode 2\n'
                '    python3 initcraft -m 3 -a --config /home/admin/env.json\n'
+               '    python3 initcraft -m 3 -a --config "maps/base.json,maps/web.json,maps/web-01.json"\n'
                '    python3 initcraft -m 4 --config "/etc/hosts /etc/hostname /etc/ssh/sshd_config"\n'
                '    python3 initcraft -b --config "/etc/hosts /etc/hostname /etc/ssh/sshd_config"\n'
                '    python3 initcraft --convert true --config /etc/hostname,/etc/fstab,/etc/nftables.conf\n'
+               '    python3 initcraft --convert --config "/etc/ssh /etc/sysctl.d/*.conf" --exclude "*.pem"\n'
                '    python3 initcraft --rollback --config "/etc/fstab, /etc/nftables.conf, /etc/ssh/sshd_config"\n'
+               '    python3 initcraft --resume\n'
+               '    python3 initcraft --undo\n'
                '\n'
                'Если аргументы не указаны - запустится TUI-режим.\n'
                ' ',
@@ -59,15 +66,27 @@ def arg_settings():
                              f'  3 (file): {menu_items[2][0]}\n'
                              f'  4 (inline): {menu_items[3][0]}\n')
     parser.add_argument('--config', type=str,
-                        help='Путь к файлу JSON формата (для режима "file") или\n'
+                        help='Путь к файлу JSON формата (для режима "file"); несколько карт\n'
+                             'через запятую объединяются по порядку: base, role, host — или\n'
                              'список путей к конфиг-файлам (для режима "inline")')
     parser.add_argument('-b', '--backup', type=str2bool, nargs='?', const=True,
                         help='Создать резервные копии конфигурационных файлов (yes/y, true/t или 1)')
     parser.add_argument('--convert', type=str2bool, nargs='?', const=True,
-                        help='Преобразовать текстовые конфигурационные файлы в формат JSON')
+                        help='Преобразовать текстовые конфигурационные файлы в формат JSON.\n'
+                             'В --config допускаются каталоги (обходятся рекурсивно) и glob-шаблоны;\n'
+                             'бинарные и не изменившиеся с прошлой конвертации файлы пропускаются')
+    parser.add_argument('--exclude', type=str,
+                        help='Шаблоны исключения для --convert (через пробел или запятую),\n'
+                             'например "*.pem,*.key,/etc/ssh/moduli"')
     parser.add_argument('--rollback', type=str2bool, nargs='?', const=True,
                         help='Восстановить конфиг-файлы из последних (по времени) созданных бэкапов,\n'
                              'расположенных в каталоге "backup"')
+    parser.add_argument('--resume', type=str2bool, nargs='?', const=True,
+                        help='Продолжить прерванное применение карты конфигурации по журналу:\n'
+                             'выполнить только незавершённые шаги')
+    parser.add_argument('--undo', type=str2bool, nargs='?', const=True,
+                        help='Отменить последнее применение карты конфигурации по журналу:\n'
+                             'вернуть только те файлы, которые были перезаписаны')
     parser.add_argument( '-a', '--apply', type=str2bool, nargs='?', const=True,
                          help='Применить настройки из карты конфигурации')
     parser.add_argument('-r', '--reboot', type=str2bool, default=False, nargs='?', const=True,
@@ -87,7 +106,7 @@ def run_cli(args):
                         f'[ERROR] Для применения настроек необходимо указать режим')
 
     def paths():
-        path_list = ConfigMaker(config_mode or 1, config_line).config_map['config_files']
+        path_list = load_editor(config_mode or 1, config_line).config_map['config_files']
         return path_list
 
     if args.backup:
@@ -98,15 +117,35 @@ def run_cli(args):
     if args.convert:
         print('[INFO] Конвертация конфиг-файлов в JSON')
         cli_log.info('конвертация файлов в JSON формат')
-        return txt_to_json(paths())
+        exclude = ConfigMaker.parse_path_list(args.exclude or '')
+        sources = ConfigMaker.parse_path_list(config_line) if config_line and not config_mode else paths()
+        return txt_to_json(sources, exclude)
 
     if args.rollback:
         print('[INFO] Восстановление конфиг-файлов из бэкапов')
         cli_log.info('восстановление конфигурационных файлов из резервных копий')
         return rollback_mode(paths())
 
+    if args.resume or args.undo:
+        journal = ApplyJournal.latest()
+        if not journal or journal.undone:
+            exit_with_error('журнал применения не найден или уже отменён',
+                            '[ERROR] Нет применения карты конфигурации, которое можно продолжить или отменить')
+
+        if args.undo:
+            print(f'[INFO] Отмена применения {journal.run_id}')
+            cli_log.info(f'отмена применения карты конфигурации {journal.run_id}')
+            return journal.undo()
+
+        if journal.finished:
+            exit_with_error(f'применение {journal.run_id} уже завершено, продолжать нечего',
+                            f'[ERROR] Применение {journal.run_id} уже завершено')
+        print(f'[INFO] Продолжение применения {journal.run_id}')
+        cli_log.info(f'продолжение применения карты конфигурации {journal.run_id}: {journal.pending()}')
+        return ConfigMaker.apply_journal(journal)
+
     if config_mode:
-        editor = ConfigMaker(config_mode, config_line)
+        editor = load_editor(config_mode, config_line)
         if args.apply:
             editor.edit_file()
 
@@ -1,60 +1,214 @@
 import os
 import json
+import hashlib
+from glob import glob
+from fnmatch import fnmatch
 from logging import getLogger
-from constant import base_dir, LogSet
+from constant import base_dir, utility_name
 
 
-conv_log = getLogger(os.path.basename(__file__).removesuffix('.py'))
-conv_log.setLevel(LogSet['level'])
-if not conv_log.handlers:
-    handler = LogSet['handler']
-    handler.setFormatter(LogSet['formatter'])
-    conv_log.addHandler(handler)
+conv_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
 
 
-def txt_to_json(files_in: list[str]) -> list[str]:
+SNIFF_SIZE = 8192
+MANIFEST_NAME = '.manifest.json'
+
+
+def expand_paths(patterns: list[str], exclude: list[str] | None = None, walked: list[str] | None = None) -> list[str]:
+    """
+    Раскрывает список путей, каталогов и glob-шаблонов в плоский список файлов.
+
+    - Каталог обходится рекурсивно (os.walk), в список попадают все вложенные файлы
+    - Шаблон с символами `*`, `?`, `[` раскрывается через glob (поддерживается `**`)
+    - Обычный путь к файлу остаётся без изменений (даже если файла нет — об этом сообщит конвертер)
+    - Пути, совпадающие с любым шаблоном из `exclude` (fnmatch по полному пути или имени файла), отбрасываются
+
+    :param patterns: Список путей к файлам, каталогам или glob-шаблонов
+    :param exclude: Список шаблонов исключения
+    :param walked: Если задан, в него добавляются все обойдённые каталоги (в том числе найденные по glob-шаблону)
+    :return: Список путей к файлам без повторов, в порядке обнаружения
+    """
+
+    exclude = exclude or []
+    found = []
+
+    for pattern in patterns:
+        if any(ch in pattern for ch in '*?['):
+            candidates = sorted(glob(pattern, recursive=True))
+        else:
+            candidates = [pattern]
+
+        for candidate in candidates:
+            if os.path.isdir(candidate):
+                if walked is not None:
+                    walked.append(candidate)
+                for root, dirs, files in os.walk(candidate):
+                    dirs.sort()
+                    found.extend(os.path.join(root, name) for name in sorted(files))
+            else:
+                found.append(candidate)
+
+    def excluded(path: str) -> bool:
+        return any(fnmatch(path, mask) or fnmatch(os.path.basename(path), mask) for mask in exclude)
+
+    return [path for path in dict.fromkeys(found) if not excluded(path)]
+
+
+def is_binary(path: str) -> bool:
+    """
+    Определяет, является ли файл бинарным, по первым SNIFF_SIZE байтам:
+    наличие нулевого байта или невалидная последовательность UTF-8 означают бинарный файл.
+    """
+
+    with open(path, 'rb') as f:
+        chunk = f.read(SNIFF_SIZE)
+
+    if b'\0' in chunk:
+        return True
+    try:
+        chunk.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Обрезанный на границе чанка многобайтовый символ бинарным файлом не считается;
+        # если файл прочитан целиком, границы чанка нет и незавершённая последовательность — ошибка кодировки
+        return not (len(chunk) == SNIFF_SIZE and e.reason == 'unexpected end of data')
+    return False
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(conv_dir: str) -> dict:
+    path = os.path.join(conv_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(conv_dir: str, manifest: dict):
+    path = os.path.join(conv_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def drop_entry(manifest: dict, source: str):
+    entry = manifest.pop(source, None)
+    if entry and os.path.isfile(entry['output']):
+        os.unlink(entry['output'])
+        conv_log.info(f'исходный файл {source} удалён, удалён и его JSON {entry["output"]}')
+
+
+def prune_manifest(manifest: dict, dirs: list[str]):
+    """
+    Удаляет из манифеста (вместе с JSON-файлами) записи об исчезнувших файлах внутри каталогов `dirs`,
+    а также записи старого формата с относительными путями.
     """
-    Конвертирует список текстовых конфигурационных файлов в формат JSON.
 
-    Для каждого указанного пути в `files_in`:
-    - Проверяет существование файла
+    roots = [os.path.join(os.path.abspath(path), '') for path in dirs]
+    for source in list(manifest):
+        if not os.path.isabs(source):
+            # Запись старого формата с относительным путём: её JSON мог достаться записи с абсолютным путём
+            manifest.pop(source)
+            continue
+        if any(source.startswith(root) for root in roots) and not os.path.isfile(source):
+            drop_entry(manifest, source)
+
+
+def txt_to_json(files_in: list[str], exclude: list[str] | None = None, base: str = base_dir, output=print,
+                manifest: dict | None = None) -> list[str]:
+    """
+    Конвертирует текстовые конфигурационные файлы в формат JSON.
+
+    Элементами `files_in` могут быть пути к файлам, каталоги (обходятся рекурсивно) и glob-шаблоны
+    (например `/etc/sysctl.d/*.conf`). Для каждого найденного файла:
+    - Проверяет существование файла и пропускает бинарные файлы
+    - Сверяет mtime, размер и sha256 с манифестом `<base>/converted/.manifest.json` (ключ — абсолютный путь);
+      неизменённые файлы повторно не конвертируются, а записи об удалённых файлах из обходимых каталогов
+      и из явно указанных путей убираются из манифеста вместе с их JSON
     - Считывает содержимое построчно
-    - Формирует структуру словаря вида {<исходный_путь>: [<строки>]}
-    - Сохраняет результат в виде JSON-файла с именем <basename>.json в директории <base_dir>/converted
+    - Формирует структуру словаря вида {<абсолютный_исходный_путь>: [<строки>]}
+    - Сохраняет результат в JSON-файл <basename>.json в директории `<base>/converted/<относительный_путь>`
     - Логирует успех или предупреждение при отсутствии файла
 
-    :param files_in: Список путей к текстовым файлам, подлежащим конвертации
-    :return: Список путей к успешно созданным JSON-файлам
+    :param files_in: Список путей к файлам, каталогам или glob-шаблонов, подлежащих конвертации
+    :param exclude: Список шаблонов исключения (см. expand_paths)
+    :param base: Корневой каталог InitCraft, в котором находится каталог `converted`
+    :param output: Функция вывода сообщений пользователю (по умолчанию print)
+    :param manifest: Уже загруженный манифест (изменяется на месте); если не задан — читается с диска
+    :return: Список путей к актуальным JSON-файлам (созданным сейчас или при прошлых запусках)
     """
 
     converted = []
+    conv_dir = os.path.join(base, 'converted')
+    os.makedirs(conv_dir, exist_ok=True)
+    if manifest is None:
+        manifest = load_manifest(conv_dir)
 
-    try:
-        for file in files_in:
-            file_out = os.path.basename(file)
-            if not os.path.isfile(file):
-                conv_log.warning(f'конвертируемый файл {file} не найден')
-                print(f'Файл {file_out} не найден\nВ логах детальнее')
+    walked = []
+    files = expand_paths(files_in, exclude, walked)
+    prune_manifest(manifest, walked)
+
+    for file in files:
+        file_out = os.path.basename(file)
+        if not os.path.isfile(file):
+            conv_log.warning(f'конвертируемый файл {file} не найден')
+            output(f'Файл {file_out} не найден\nВ логах детальнее')
+            drop_entry(manifest, os.path.abspath(file))
+            continue
+
+        # Один и тот же файл может быть указан относительным и абсолютным путём — в манифесте он один
+        file = os.path.abspath(file)
+        try:
+            stat = os.stat(file)
+            entry = manifest.get(file)
+            if entry and os.path.isfile(entry['output']):
+                if entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    converted.append(entry['output'])
+                    continue
+
+                digest = file_hash(file)
+                if entry['hash'] == digest:
+                    entry.update(mtime=stat.st_mtime_ns, size=stat.st_size)
+                    converted.append(entry['output'])
+                    continue
+            else:
+                digest = None
+
+            if is_binary(file):
+                manifest.pop(file, None)
+                conv_log.info(f'бинарный файл {file} пропущен')
                 continue
 
             with open(file, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
 
             data = {file: lines}
-            conv_dir = os.path.join(base_dir, 'converted')
-            os.makedirs(conv_dir, exist_ok=True)
-            json_file = f'{file_out}.json'
-            path_file = os.path.join(conv_dir, json_file)
+            dirs_tree = os.path.join(conv_dir, os.path.dirname(file).strip('/'))
+            os.makedirs(dirs_tree, exist_ok=True)
+            path_file = os.path.join(dirs_tree, f'{file_out}.json')
             with open(path_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=4, ensure_ascii=False)
 
+            manifest[file] = {
+                'mtime': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'hash': digest or file_hash(file),
+                'output': path_file,
+            }
             conv_log.info(f'{file} успешно конвертирован в {path_file}')
             converted.append(path_file)
 
-        return converted
-
-    except Exception as e:
-        conv_log.error(f'ошибка при конвертации {f}: {e}')
-        print(f'Ошибка при конвертации{f}: {e}')
-        return converted
+        except Exception as e:
+            conv_log.error(f'ошибка при конвертации {file}: {e}')
+            output(f'Ошибка при конвертации {file}: {e}')
 
+    save_manifest(conv_dir, manifest)
+    return converted
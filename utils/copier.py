@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+from logging import getLogger
+from constant import utility_name
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+copy_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
+
+
+# _IOW(0x94, 9, int) из linux/fs.h
+FICLONE = 0x40049409
+CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+
+def _check_copied(copied: int, size: int) -> bool:
+    # Ядро может вернуть 0 раньше конца файла: если ничего не скопировано — пробуем следующий способ,
+    # иначе файл назначения уже частично записан, и выдавать его за успешную копию нельзя
+    if copied >= size:
+        return True
+    if copied == 0:
+        return False
+    raise OSError(f'скопировано {copied} из {size} байт')
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    copied = 0
+    try:
+        while copied < size:
+            sent = os.copy_file_range(src_fd, dst_fd, min(CHUNK_SIZE, size - copied))
+            if sent == 0:
+                break
+            copied += sent
+    except OSError:
+        if copied:
+            raise
+        return False
+    return _check_copied(copied, size)
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> bool:
+    copied = 0
+    try:
+        while copied < size:
+            sent = os.sendfile(dst_fd, src_fd, copied, min(CHUNK_SIZE, size - copied))
+            if sent == 0:
+                break
+            copied += sent
+    except OSError:
+        if copied:
+            raise
+        return False
+    return _check_copied(copied, size)
+
+
+def copy_file(src: str, dst: str) -> str:
+    """
+    Копирует файл `src` в `dst` с сохранением метаданных (аналог shutil.copy2) самым дешёвым доступным способом:
+    - reflink (ioctl FICLONE) — мгновенное копирование на CoW-файловых системах (btrfs, xfs, bcachefs)
+    - os.copy_file_range — копирование внутри ядра без передачи данных через userspace
+    - os.sendfile — то же для ядер и ФС без поддержки copy_file_range
+    - shutil.copyfileobj — буферизованное копирование как последний вариант и для файлов нулевого размера
+
+    :param src: Путь к исходному файлу
+    :param dst: Путь к файлу назначения (перезаписывается)
+    :return: Название использованного способа: reflink, copy_file_range, sendfile или buffered
+    """
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(src_fd).st_size
+
+        if size == 0:
+            # Нулевой размер не гарантирует пустой файл: procfs, sysfs и часть FUSE-файлов сообщают st_size 0,
+            # а содержимое отдают только при чтении
+            shutil.copyfileobj(fsrc, fdst)
+            method = 'buffered'
+        elif _reflink(src_fd, dst_fd):
+            method = 'reflink'
+        elif _copy_range(src_fd, dst_fd, size):
+            method = 'copy_file_range'
+        elif _sendfile(src_fd, dst_fd, size):
+            method = 'sendfile'
+        else:
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst)
+            method = 'buffered'
+
+    shutil.copystat(src, dst)
+    copy_log.debug(f'{src} → {dst}: {method}')
+    return method
+
+
+def replace_file(src: str, dst: str) -> str:
+    """
+    Атомарно заменяет `dst` копией `src`: копия готовится во временном файле рядом с `dst`
+    (в той же файловой системе), получает владельца заменяемого файла и переименовывается поверх него
+    через os.replace. Символьные ссылки разыменовываются — заменяется целевой файл, а не сама ссылка.
+    При любом сбое `dst` остаётся в прежнем состоянии.
+
+    :param src: Путь к исходному файлу (например, резервной копии)
+    :param dst: Путь к заменяемому файлу
+    :return: Название способа копирования (см. copy_file)
+    """
+
+    dst = os.path.realpath(dst)
+    dst_dir = os.path.dirname(dst)
+    fd, staged = tempfile.mkstemp(prefix=f'.{os.path.basename(dst)}.', suffix='.tmp', dir=dst_dir)
+    os.close(fd)
+    try:
+        method = copy_file(src, staged)
+        if os.path.exists(dst):
+            stat = os.stat(dst)
+            os.chown(staged, stat.st_uid, stat.st_gid)
+        os.replace(staged, dst)
+    except BaseException:
+        if os.path.exists(staged):
+            os.unlink(staged)
+        raise
+    return method
@@ -1,17 +1,22 @@
 import os
-import sys
 import json
+import asyncio
+import hashlib
 from logging import getLogger
-from constant import base_dir, LogSet
+from constant import base_dir, utility_name
 from utils.converter import txt_to_json
+from utils.os_worker import OSWorker
+from utils.journal import ApplyJournal
 
 
-edit_log = getLogger(os.path.basename(__file__).removesuffix('.py'))
-edit_log.setLevel(LogSet['level'])
-if not edit_log.handlers:
-    handler = LogSet['handler']
-    handler.setFormatter(LogSet['formatter'])
-    edit_log.addHandler(handler)
+edit_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
+
+
+MAP_CACHE_SIZE = 32
+
+
+class ConfigMapError(Exception):
+    """Ошибка загрузки карты конфигурации: неверный режим, путь или формат карты."""
 
 
 class ConfigMaker:
@@ -23,17 +28,22 @@ class ConfigMaker:
     - Поддержка четырёх режимов загрузки конфигураций: default, generate, file, inline
     - Работа с файлом `env.json` (чтение, создание, редактирование)
     - Поддержка ввода путей к конфигам как строка (режим inline)
+    - Послойная сборка карты из нескольких файлов (base, role, host) в режиме file с кэшированием результата
     - Интеграция с конвертером текстовых конфигураций в JSON
     - Прямое редактирование целевых конфигурационных файлов по карте конфигурации
     - Логгирование всех операций
 
     Используется для первичной инициализации и автоматического применения настроек на сервере (VPS/ServerPC).
+    При неверных входных данных выбрасывает ConfigMapError.
     """
 
-    def __init__(self, conf_mode: int, config_line: str) -> None:
+    def __init__(self, conf_mode: int, config_line: str | list[str], base: str = base_dir, output=print) -> None:
+        self.base = base
+        self.output = output
         self.config_mode = None
-        self.environ_json = os.path.join(base_dir, 'env.json')
+        self.environ_json = os.path.join(base, 'env.json')
         self.inline_paths = []
+        self.layers = []
         self.config_map = {}
 
         if conf_mode in {1, 2, 4} and not self.check_line(self.environ_json):
@@ -41,16 +51,21 @@ class ConfigMaker:
 
         if conf_mode in {1, 2}:
             self.config_mode = {1: 'default', 2: 'generate'}[conf_mode]
-            self.config_map = self.load_json(self.environ_json)
+            self.config_map = self.load_layers([self.environ_json])
 
         elif conf_mode == 3:
-            if self.check_line(config_line):
+            if isinstance(config_line, list):
+                layers = config_line
+            else:
+                layers = [config_line] if self.check_line(config_line) else self.parse_path_list(config_line)
+            if layers and all(self.check_line(layer) for layer in layers):
                 self.config_mode = 'file'
-                self.environ_json = config_line
-                self.config_map = self.load_json(self.environ_json)
+                self.layers = layers
+                self.environ_json = layers[-1]
+                self.config_map = self.load_layers(layers)
             else:
-                self.exit_with_error(f'путь к файлу конфигурации либо его формат неверны: {config_line}',
-                                     f'[ERROR] Неверный путь или формат конфигурации: {config_line}')
+                self.raise_error(f'путь к файлу конфигурации либо его формат неверны: {config_line}',
+                                 f'Неверный путь или формат конфигурации: {config_line}')
 
         elif conf_mode == 4:
             if self.inline_path_list(config_line):
@@ -59,21 +74,26 @@ class ConfigMaker:
                 self.config_map = self.load_json(self.environ_json)
                 self.config_map['config_files'] = (self.config_map['config_files'] + self.inline_paths
                                                    if self.config_map.get('config_files') else self.inline_paths)
-                converter = txt_to_json(self.config_map['config_files'])
+                converter = txt_to_json(self.config_map['config_files'], base=self.base, output=self.output)
                 self.edit_json(converter)
-                self.config_map = self.load_json(self.environ_json)
+                self.config_map = self.load_layers([self.environ_json])
             else:
-                self.exit_with_error(f'одно или несколько недопустимых имён фалов конфигурации: {config_line}',
-                                     f'[ERROR] Недопустимое имя конфигурационного файла: {config_line}')
+                self.raise_error(f'одно или несколько недопустимых имён фалов конфигурации: {config_line}',
+                                 f'Недопустимое имя конфигурационного файла: {config_line}')
 
         else:
-            self.exit_with_error(f'в строке конфигурации {config_line or "None"} недопустимые значения',
-                                 f'[ERROR] Недопустимое значение config_line: {config_line or "None"}')
+            self.raise_error(f'в строке конфигурации {config_line or "None"} недопустимые значения',
+                             f'Недопустимое значение config_line: {config_line or "None"}')
+
+        try:
+            OSWorker.validate_hooks(self.config_map.get('hooks', {}))
+        except ValueError as e:
+            self.raise_error(f'некорректная секция hooks в карте конфигурации: {e}',
+                             f'Некорректная секция hooks: {e}')
 
-    def exit_with_error(self, log_message: str, message: str):
+    def raise_error(self, log_message: str, message: str):
         edit_log.error(log_message)
-        print(message)
-        sys.exit(1)
+        raise ConfigMapError(message)
 
     def check_line(self, line: str) -> bool:
         if os.path.isfile(line) and line.endswith('.json'):
@@ -81,7 +101,8 @@ class ConfigMaker:
         else:
             return False
 
-    def parse_path_list(self, value: str) -> list[str]:
+    @staticmethod
+    def parse_path_list(value: str) -> list[str]:
         cleaned = value.replace(', ', ',').replace(' ,', ',').replace(' ', ',')
         return [p.strip() for p in cleaned.split(',') if p.strip()]
 
@@ -100,12 +121,134 @@ class ConfigMaker:
             edit_log.debug(f'автоматическое создание карты конфигурации: {path}')
 
     def load_json(self, path) -> dict:
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.raise_error(f'карта конфигурации {path} не прочитана: {e}',
+                             f'Не удалось прочитать карту конфигурации {path}: {e}')
 
+        if not isinstance(data, dict):
+            self.raise_error(f'карта конфигурации {path} не является JSON-объектом',
+                             f'Карта конфигурации {path} должна быть JSON-объектом')
         data.pop("_comment", None)
         return data
 
+    @staticmethod
+    def merge_maps(maps: list[dict]) -> dict:
+        """
+        Объединяет карты конфигурации по порядку: каждая следующая карта (base → role → host) переопределяет предыдущие.
+
+        Правила слияния:
+        - `config_files` — объединение списков всех слоёв с сохранением порядка и без повторов
+        - `hooks` — слияние по имени хука, хук следующего слоя заменяет одноимённый целиком
+        - содержимое файла (ключ — путь к файлу) заменяется целиком значением из следующего слоя
+        - значение `null` удаляет файл (или хук) из итоговой карты, в том числе из `config_files`;
+          `"hooks": null` удаляет все хуки предыдущих слоёв
+        """
+
+        merged = {'config_files': []}
+        removed = set()
+        for layer in maps:
+            for key, value in layer.items():
+                if key == '_comment':
+                    continue
+                if key == 'config_files':
+                    merged['config_files'].extend(p for p in value or [] if p not in merged['config_files'])
+                elif key == 'hooks':
+                    if value is None:
+                        merged['hooks'] = {}
+                        continue
+                    if not isinstance(value, dict):
+                        raise ValueError('секция hooks должна быть объектом {<имя хука>: {...}}')
+                    hooks = merged.setdefault('hooks', {})
+                    for name, hook in value.items():
+                        if hook is None:
+                            hooks.pop(name, None)
+                        else:
+                            hooks[name] = hook
+                elif value is None:
+                    merged.pop(key, None)
+                    removed.add(key)
+                else:
+                    merged[key] = value
+                    removed.discard(key)
+
+        merged['config_files'] = [p for p in merged['config_files'] if p not in removed]
+        return merged
+
+    def load_layers(self, layers: list[str]) -> dict:
+        """
+        Загружает карту конфигурации из одного или нескольких слоёв (см. merge_maps).
+
+        Единственный слой тоже проходит через merge_maps (так `null` удаляет файл из карты), но не кэшируется.
+        Результат слияния нескольких слоёв кэшируется в `<base>/cache/maps/<sha256>.json`, где ключ — хэш путей
+        и содержимого всех слоёв, поэтому повторный запуск с теми же файлами читает один готовый JSON без разбора
+        и слияния слоёв. В кэше хранятся MAP_CACHE_SIZE последних использованных карт, остальные удаляются.
+        """
+
+        if len(layers) == 1:
+            return self.merge_layers(layers, [self.load_json(layers[0])])
+
+        digest = hashlib.sha256()
+        contents = []
+        for layer in layers:
+            try:
+                with open(layer, 'rb') as f:
+                    content = f.read()
+            except OSError as e:
+                self.raise_error(f'слой карты конфигурации {layer} не прочитан: {e}',
+                                 f'Не удалось прочитать карту конфигурации {layer}: {e}')
+            contents.append(content)
+            digest.update(os.path.abspath(layer).encode())
+            digest.update(hashlib.sha256(content).digest())
+
+        cache_dir = os.path.join(self.base, 'cache', 'maps')
+        cache_file = os.path.join(cache_dir, f'{digest.hexdigest()}.json')
+        if os.path.isfile(cache_file):
+            edit_log.info(f'карта конфигурации из слоёв {layers} загружена из кэша {cache_file}')
+            os.utime(cache_file)
+            return self.load_json(cache_file)
+
+        maps = []
+        for layer, content in zip(layers, contents):
+            try:
+                data = json.loads(content)
+            except ValueError as e:
+                self.raise_error(f'слой карты конфигурации {layer} не разобран: {e}',
+                                 f'Не удалось прочитать карту конфигурации {layer}: {e}')
+            if not isinstance(data, dict):
+                self.raise_error(f'слой карты конфигурации {layer} не является JSON-объектом',
+                                 f'Карта конфигурации {layer} должна быть JSON-объектом')
+            maps.append(data)
+
+        merged = self.merge_layers(layers, maps)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f'{cache_file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(merged, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+        edit_log.info(f'карта конфигурации собрана из слоёв {layers} и сохранена в кэш {cache_file}')
+        self.prune_cache(cache_dir)
+        return merged
+
+    def merge_layers(self, layers: list[str], maps: list[dict]) -> dict:
+        try:
+            return self.merge_maps(maps)
+        except ValueError as e:
+            self.raise_error(f'слои карты конфигурации {layers} не объединены: {e}',
+                             f'Не удалось объединить карты конфигурации: {e}')
+
+    @staticmethod
+    def prune_cache(cache_dir: str):
+        cached = sorted((entry for entry in os.scandir(cache_dir) if entry.name.endswith('.json')),
+                        key=lambda entry: entry.stat().st_mtime)
+        for entry in cached[:-MAP_CACHE_SIZE]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
     def edit_json(self, path_list: list):
         with open(self.environ_json, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -121,22 +264,111 @@ class ConfigMaker:
         with open(self.environ_json, 'w') as f:
             json.dump(data, f, indent=4, ensure_ascii=False)
             edit_log.info(f'файл конфигурации {self.environ_json} обновлена актуальными данными')
-            print(f"[OK] Карта конфигурации {self.environ_json} перезаписана")
+            self.output(f"[OK] Карта конфигурации {self.environ_json} перезаписана")
 
-    def edit_file(self):
+    def edit_file(self) -> dict:
         self.config_map.pop("config_files", None)
-        for key, value in self.config_map.items():
+        journal = ApplyJournal.start(self.config_map, self.base)
+        return self.apply_journal(journal, self.output)
+
+    @staticmethod
+    def apply_journal(journal: ApplyJournal, output=print) -> dict:
+        """
+        Применяет карту конфигурации из журнала `journal`, пропуская уже выполненные шаги.
+
+        Перед перезаписью каждого файла его оригинал сохраняется в журнал, после записи шаг отмечается выполненным.
+        Хуки запускаются, когда записаны все файлы, — для всех файлов, изменённых в рамках запуска
+        (в том числе до прерывания); хуки, выполненные до прерывания, повторно не запускаются.
+        Используется как для нового применения (edit_file), так и для продолжения прерванного (--resume).
+
+        :return: Результаты выполнения хуков (см. OSWorker.run_hooks)
+        """
+
+        if not ConfigMaker.write_files(journal, output):
+            return {}
+
+        results = {}
+        if not journal.is_done("hooks"):
+            results = OSWorker(output).run_hooks(journal.config_map.get("hooks", {}), journal.changed_files(), journal)
+            journal.complete("hooks")
+
+        journal.finish()
+        return results
+
+    @staticmethod
+    async def apply_journal_async(journal: ApplyJournal, output=print) -> dict:
+        """
+        Асинхронный вариант apply_journal для вызова из работающего event loop: файлы записываются в отдельном
+        потоке, хуки выполняются в текущем цикле.
+        """
+
+        if not await asyncio.to_thread(ConfigMaker.write_files, journal, output):
+            return {}
+
+        results = {}
+        if not journal.is_done("hooks"):
+            results = await OSWorker(output).run_hooks_async(journal.config_map.get("hooks", {}),
+                                                             journal.changed_files(), journal)
+            journal.complete("hooks")
+
+        journal.finish()
+        return results
+
+    @staticmethod
+    def write_files(journal: ApplyJournal, output=print) -> bool:
+        """
+        Записывает файлы карты из журнала, пропуская уже выполненные шаги.
+
+        :return: True, если все файлы записаны и можно переходить к хукам
+        """
+
+        for key, value in journal.config_map.items():
+            if key in ("config_files", "hooks") or journal.is_done(key):
+                continue
+
             edit_log.info(f'редактирование файла конфигурации {key}')
-            print(f'[INFO] Редактирование файла: {key}')
-            self.update_file(key, value)
+            output(f'[INFO] Редактирование файла: {key}')
+            if ConfigMaker.file_is_actual(key, value):
+                # Запись, начатая до прерывания, могла успеть завершиться: файл всё равно изменён этим запуском
+                resumed = key in journal.begun
+                edit_log.info(f'файл {key} не изменился, перезапись не требуется')
+                output(f"[OK] Файл {key} актуален")
+                journal.complete(key, changed=resumed)
+                continue
+
+            journal.begin(key)
+            if ConfigMaker.update_file(key, value, output):
+                journal.complete(key, changed=True)
+
+        pending = [step for step in journal.pending() if step != "hooks"]
+        if pending:
+            edit_log.warning(f'применение {journal.run_id} не завершено, невыполненные шаги: {pending}')
+            output(f'[WARNING] Не все файлы записаны: {", ".join(pending)}\n'
+                   f'Для повторной попытки используйте --resume, для отмены изменений — --undo')
+            return False
+
+        return True
+
+    @staticmethod
+    def file_is_actual(file_path: str, new_entry: list[str]) -> bool:
+        try:
+            with open(file_path, 'r', encoding='utf-8', newline='') as f:
+                return f.read() == ''.join(new_entry)
+        except (OSError, UnicodeDecodeError):
+            return False
 
-    def update_file(self, file_path: str, new_entry: list[str]):
+    @staticmethod
+    def update_file(file_path: str, new_entry: list[str], output=print) -> bool:
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.writelines(new_entry)
+                f.flush()
+                os.fsync(f.fileno())
                 edit_log.info(f'файл {file_path} обновлен актуальными данными')
-                print(f"[OK] Файл {file_path} перезаписан")
+                output(f"[OK] Файл {file_path} перезаписан")
+                return True
 
         except Exception as e:
             edit_log.error(f'перезапись {file_path} не удалась: {e}')
-            print(f'[ERROR] Ошибка при записи {file_path}')
+            output(f'[ERROR] Ошибка при записи {file_path}')
+            return False
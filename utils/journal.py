@@ -0,0 +1,200 @@
+import os
+import json
+import shutil
+from datetime import datetime
+from logging import getLogger
+from constant import base_dir, utility_name
+from utils.copier import copy_file, replace_file
+
+
+journal_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
+
+
+KEEP_RUNS = 5
+
+
+class ApplyJournal:
+    """
+    Журнал упреждающей записи (write-ahead) для применения карты конфигурации.
+
+    Каждый запуск применения получает каталог `<base>/journal/<run_id>/`, в котором хранятся:
+    - `map.json` — снимок применяемой карты конфигурации
+    - `journal.jsonl` — журнал событий, который только дописывается (каждая запись сбрасывается на диск через fsync)
+    - `originals/` — копии файлов в том виде, в котором они были до перезаписи
+
+    События журнала: plan (план шагов), begin (файл сейчас будет перезаписан, оригинал сохранён),
+    done (шаг выполнен), hook_begin и hook_done (запуск и результат отдельного хука),
+    finish (применение завершено), undo (изменения отменены).
+    По журналу прерванный запуск можно продолжить (`resume`) или отменить (`undo`);
+    при продолжении уже выполненные файлы и хуки повторно не обрабатываются.
+    Журнал завершённого запуска, который не перезаписал ни одного файла, удаляется.
+    """
+
+    def __init__(self, run_dir: str) -> None:
+        self.run_dir = run_dir
+        self.run_id = os.path.basename(run_dir)
+        self.journal_file = os.path.join(run_dir, 'journal.jsonl')
+        self.config_map = {}
+        self.steps = []
+        self.begun = {}
+        self.done = {}
+        self.hooks_begun = set()
+        self.hooks_done = {}
+        self.finished = False
+        self.undone = False
+
+    @staticmethod
+    def journal_dir(base: str = base_dir) -> str:
+        return os.path.join(base, 'journal')
+
+    @classmethod
+    def start(cls, config_map: dict, base: str = base_dir) -> 'ApplyJournal':
+        run_id = datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f')
+        journal = cls(os.path.join(cls.journal_dir(base), run_id))
+        os.makedirs(os.path.join(journal.run_dir, 'originals'), exist_ok=True)
+        with open(os.path.join(journal.run_dir, 'map.json'), 'w', encoding='utf-8') as f:
+            json.dump(config_map, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        journal.config_map = config_map
+        journal.steps = [key for key in config_map if key not in ('config_files', 'hooks')] + ['hooks']
+        journal.append({'event': 'plan', 'steps': journal.steps})
+        journal_log.info(f'журнал применения {run_id}: запланировано шагов {len(journal.steps)}')
+        cls.prune(base)
+        return journal
+
+    @classmethod
+    def load(cls, run_dir: str) -> 'ApplyJournal':
+        journal = cls(run_dir)
+        with open(os.path.join(run_dir, 'map.json'), 'r', encoding='utf-8') as f:
+            journal.config_map = json.load(f)
+
+        with open(journal.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Последняя запись могла не дописаться при обрыве — она не считается выполненной
+                    break
+                event = record['event']
+                if event == 'plan':
+                    journal.steps = record['steps']
+                elif event == 'begin':
+                    journal.begun[record['step']] = record['original']
+                elif event == 'done':
+                    journal.done[record['step']] = record.get('changed', False)
+                elif event == 'hook_begin':
+                    journal.hooks_begun.add(record['hook'])
+                elif event == 'hook_done':
+                    journal.hooks_done[record['hook']] = record['result']
+                elif event == 'finish':
+                    journal.finished = True
+                elif event == 'undo':
+                    journal.undone = True
+        return journal
+
+    @classmethod
+    def latest(cls, base: str = base_dir) -> 'ApplyJournal | None':
+        runs = cls.runs(base)
+        return cls.load(runs[-1]) if runs else None
+
+    @classmethod
+    def runs(cls, base: str = base_dir) -> list[str]:
+        root = cls.journal_dir(base)
+        if not os.path.isdir(root):
+            return []
+        return [os.path.join(root, name) for name in sorted(os.listdir(root))
+                if os.path.isfile(os.path.join(root, name, 'journal.jsonl'))]
+
+    @classmethod
+    def prune(cls, base: str = base_dir):
+        for run_dir in cls.runs(base)[:-KEEP_RUNS]:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def append(self, record: dict):
+        record = {'time': datetime.now().isoformat(timespec='seconds'), **record}
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, path: str):
+        """
+        Сохраняет оригинал файла `path` и отмечает в журнале начало его перезаписи.
+        При повторной попытке (resume) уже сохранённый оригинал не перезаписывается.
+        """
+
+        if path in self.begun:
+            original = self.begun[path]
+        elif os.path.isfile(path):
+            original = os.path.join(self.run_dir, 'originals', path.strip('/'))
+            os.makedirs(os.path.dirname(original), exist_ok=True)
+            copy_file(path, original)
+            with open(original, 'rb') as f:
+                os.fsync(f.fileno())
+        else:
+            original = None
+
+        self.begun[path] = original
+        self.append({'event': 'begin', 'step': path, 'original': original})
+
+    def complete(self, step: str, changed: bool = False):
+        self.done[step] = changed
+        self.append({'event': 'done', 'step': step, 'changed': changed})
+
+    def begin_hook(self, name: str):
+        self.hooks_begun.add(name)
+        self.append({'event': 'hook_begin', 'hook': name})
+
+    def complete_hook(self, name: str, result: dict):
+        # Вывод команды в журнал не пишется: для продолжения достаточно статуса хука
+        result = {key: result[key] for key in ('status', 'returncode', 'duration')}
+        self.hooks_done[name] = result
+        self.append({'event': 'hook_done', 'hook': name, 'result': result})
+
+    def finish(self):
+        self.finished = True
+        if not self.begun:
+            # Запуск ничего не перезаписал: его журнал не должен вытеснять из `latest` и `prune` запуски,
+            # изменения которых ещё можно отменить
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+            journal_log.info(f'журнал применения {self.run_id}: файлы не изменялись, журнал удалён')
+            return
+        self.append({'event': 'finish'})
+        journal_log.info(f'журнал применения {self.run_id}: применение завершено')
+
+    def is_done(self, step: str) -> bool:
+        return step in self.done
+
+    def changed_files(self) -> list[str]:
+        return [step for step, changed in self.done.items() if changed]
+
+    def pending(self) -> list[str]:
+        return [step for step in self.steps if step not in self.done]
+
+    def undo(self, output=print) -> list[str]:
+        """
+        Отменяет изменения запуска: восстанавливает из `originals/` каждый файл, перезапись которого была начата
+        (в том числе прерванную на середине), а созданные с нуля файлы удаляет. Выполненные хуки не отменяются.
+
+        :return: Список восстановленных или удалённых файлов
+        """
+
+        reverted = []
+        for path, original in reversed(list(self.begun.items())):
+            try:
+                if original:
+                    replace_file(original, path)
+                elif os.path.exists(path):
+                    os.unlink(path)
+                reverted.append(path)
+                journal_log.info(f'журнал применения {self.run_id}: отменено изменение {path}')
+                output(f'[⮌] Файл {path} возвращён в исходное состояние')
+            except Exception as e:
+                journal_log.error(f'журнал применения {self.run_id}: не удалось отменить изменение {path}: {e}')
+                output(f'[ERROR] Не удалось отменить изменение {path}: {e}')
+
+        self.undone = True
+        self.append({'event': 'undo', 'reverted': reverted})
+        return reverted
@@ -1,18 +1,13 @@
 import os
 import sys
-from utils.editor import ConfigMaker
+from utils.editor import ConfigMaker, ConfigMapError
 from utils.os_worker import OSWorker
 from utils.backup import create_backup
 from logging import getLogger
-from constant import LogSet, utility_name, menu_items
+from constant import utility_name, menu_items
 
 
-menu_print_log = getLogger(os.path.basename(__file__).removesuffix('.py'))
-menu_print_log.setLevel(LogSet['level'])
-if not menu_print_log.handlers:
-    handler = LogSet['handler']
-    handler.setFormatter(LogSet['formatter'])
-    menu_print_log.addHandler(handler)
+menu_print_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
 
 
 class Interactive:
@@ -54,7 +49,12 @@ class Interactive:
             if choice in {'1', '2'}:
                 conf_mode = {'1': 1, '2': 2}[choice]
                 config_line = {'1': 'default', '2': 'generate'}[choice]
-                editor = ConfigMaker(conf_mode, config_line)
+                try:
+                    editor = ConfigMaker(conf_mode, config_line)
+                except ConfigMapError as e:
+                    print(f'[ERROR] {e}')
+                    continue
+
                 if conf_mode == 1:
                     menu_print_log.debug('выбран вариант использования существующего файла конфигурации (env.json)')
                     print(f'[OK] Карта конфигурации загружена\n'
@@ -71,7 +71,12 @@ class Interactive:
                     print('[WARNING] В указанном пути нет файла JSON.\nПопробуйте снова')
                     continue
 
-                editor = ConfigMaker(3, path)
+                try:
+                    editor = ConfigMaker(3, path)
+                except ConfigMapError as e:
+                    print(f'[ERROR] {e}')
+                    continue
+
                 print(f'[OK] Кастомная карта конфигурации загружена\n{editor.environ_json}')
                 map_is_load = True
 
@@ -79,7 +84,12 @@ class Interactive:
                 menu_print_log.debug('выбран вариант генерации нового файла конфигурации (env.json)')
                 print('Введите через пробел или запятую пути к файлам конфигурации,')
                 inline = input('например - /etc/hosts,/etc/hostname,/etc/ssh/sshd_config #> ')
-                editor = ConfigMaker(4, inline)
+                try:
+                    editor = ConfigMaker(4, inline)
+                except ConfigMapError as e:
+                    print(f'[ERROR] {e}')
+                    continue
+
                 print(f'[OK] Карта конфигурации заполнена вручную\n{editor.config_map["config_files"]}')
 
             elif choice == 'exit' or choice == 'quit' or choice == 'cancel':
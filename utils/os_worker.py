@@ -1,32 +1,255 @@
 import os
+import time
+import shlex
+import signal
+import asyncio
 import logging
 import subprocess
-from constant import LogSet
+from concurrent.futures import ThreadPoolExecutor
+from constant import utility_name
+from utils.journal import ApplyJournal
 
 
-osworker_log = logging.getLogger(os.path.basename(__file__).removesuffix('.py'))
-osworker_log.setLevel(LogSet['level'])
-if not osworker_log.handlers:
-    handler = LogSet['handler']
-    handler.setFormatter(LogSet['formatter'])
-    osworker_log.addHandler(handler)
+osworker_log = logging.getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
+
+
+HOOK_TIMEOUT = 120
+KILL_DRAIN_TIMEOUT = 5
 
 
 class OSWorker:
+    def __init__(self, output=print) -> None:
+        self.output = output
+
     def restart_service(self, service: str) -> bool:
         if not service:
             return True
         try:
             subprocess.run(["systemctl", "restart", service], check=True)
             subprocess.run(["systemctl", "is-active", "--quiet", service], check=True)
-            print(f"[✓] Служба {service} успешно перезапущена")
+            self.output(f"[✓] Служба {service} успешно перезапущена")
             return True
         except subprocess.CalledProcessError:
-            print(f"[✗] Ошибка при перезапуске службы: {service}")
+            self.output(f"[✗] Ошибка при перезапуске службы: {service}")
             return False
 
     def os_reboot(self):
-        print('[INFO] Система уходит в перезагрузку')
+        self.output('[INFO] Система уходит в перезагрузку')
         osworker_log.info('будет выполнена перезагрузка системы')
         logging.shutdown()
         subprocess.Popen(['systemctl', 'reboot'])
+
+    @staticmethod
+    def validate_hooks(hooks: dict):
+        """
+        Проверяет секцию `hooks` карты конфигурации: типы полей (`files` и `after` — списки строк, `command` —
+        строка или список строк, `timeout` — положительное число), разбор команды (shlex) в непустой список аргументов,
+        существование всех зависимостей из `after` и отсутствие циклов в графе зависимостей.
+        При ошибке выбрасывает ValueError.
+        """
+
+        if not isinstance(hooks, dict):
+            raise ValueError('секция hooks должна быть объектом {<имя хука>: {...}}')
+
+        for name, hook in hooks.items():
+            if not isinstance(hook, dict):
+                raise ValueError(f'хук {name} должен быть объектом с полями files, command, after, timeout')
+            command = hook.get('command')
+            if not (isinstance(command, str) or
+                    isinstance(command, list) and all(isinstance(arg, str) for arg in command)):
+                raise ValueError(f'у хука {name} не задана команда (строка или список строк)')
+            args = OSWorker.hook_args(name, command)
+            if not args or not args[0]:
+                raise ValueError(f'у хука {name} пустая команда')
+            for field in ('files', 'after'):
+                value = hook.get(field, [])
+                if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                    raise ValueError(f'поле {field} хука {name} должно быть списком строк')
+            timeout = hook.get('timeout', HOOK_TIMEOUT)
+            if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+                raise ValueError(f'поле timeout хука {name} должно быть положительным числом')
+            unknown = [dep for dep in hook.get('after', []) if dep not in hooks]
+            if unknown:
+                raise ValueError(f'хук {name} зависит от неизвестных хуков: {", ".join(unknown)}')
+
+        state = {}
+
+        def visit(name: str, chain: list[str]):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f'циклическая зависимость хуков: {" → ".join(chain + [name])}')
+            state[name] = 'visiting'
+            for dep in hooks[name].get('after', []):
+                visit(dep, chain + [name])
+            state[name] = 'done'
+
+        for name in hooks:
+            visit(name, [])
+
+    @staticmethod
+    def hook_args(name: str, command: str | list[str]) -> list[str]:
+        if isinstance(command, list):
+            return list(command)
+        try:
+            return shlex.split(command)
+        except ValueError as e:
+            raise ValueError(f'команда хука {name} не разбирается: {e}') from e
+
+    def run_hooks(self, hooks: dict, changed: list[str], journal: ApplyJournal | None = None) -> dict:
+        """
+        Выполняет post-apply хуки из секции `hooks` карты конфигурации.
+
+        Формат хука: {"files": [<пути>], "command": "<команда>", "after": [<имена хуков>], "timeout": <секунды>}.
+        Запускаются только хуки, среди `files` которых есть изменённые файлы из `changed`. Независимые хуки
+        выполняются параллельно через asyncio-подпроцессы, хук из `after` дожидается завершения своих зависимостей,
+        а при их неудаче пропускается. Незапущенные зависимости считаются выполненными.
+        Если задан `journal`, запуск и результат каждого хука записываются в него, а хуки, уже выполненные
+        до прерывания, повторно не запускаются — в результат попадает их сохранённый статус.
+        Некорректная секция `hooks` (см. validate_hooks) вызывает ValueError; обычно она отсекается ещё
+        при загрузке карты (ConfigMaker).
+
+        :param hooks: Секция `hooks` карты конфигурации
+        :param changed: Список файлов, фактически изменённых при применении карты
+        :param journal: Журнал применения карты (ApplyJournal)
+        :return: Словарь {<имя хука>: {"status", "returncode", "stdout", "stderr", "duration"}} по запущенным хукам
+        """
+
+        triggered = self.triggered_hooks(hooks, changed)
+        if not triggered:
+            return {}
+
+        started = time.monotonic()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            results = asyncio.run(self._run_hook_graph(hooks, triggered, journal))
+        else:
+            # Вызов из работающего event loop (встраивание в асинхронное приложение): asyncio.run здесь недоступен,
+            # поэтому граф хуков выполняется в собственном цикле отдельного потока
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                results = executor.submit(asyncio.run, self._run_hook_graph(hooks, triggered, journal)).result()
+        osworker_log.info(f'хуки выполнены за {time.monotonic() - started:.2f} с: {len(results)} шт.')
+        return results
+
+    async def run_hooks_async(self, hooks: dict, changed: list[str], journal: ApplyJournal | None = None) -> dict:
+        """Асинхронный вариант run_hooks для вызова из работающего event loop."""
+
+        triggered = self.triggered_hooks(hooks, changed)
+        if not triggered:
+            return {}
+
+        started = time.monotonic()
+        results = await self._run_hook_graph(hooks, triggered, journal)
+        osworker_log.info(f'хуки выполнены за {time.monotonic() - started:.2f} с: {len(results)} шт.')
+        return results
+
+    def triggered_hooks(self, hooks: dict, changed: list[str]) -> list[str]:
+        if not hooks:
+            return []
+
+        self.validate_hooks(hooks)
+        changed = set(changed)
+        triggered = [name for name, hook in hooks.items() if changed.intersection(hook.get('files', []))]
+        if not triggered:
+            osworker_log.info('изменённых файлов для хуков нет, хуки не запускаются')
+        return triggered
+
+    async def _run_hook_graph(self, hooks: dict, triggered: list[str], journal: ApplyJournal | None) -> dict:
+        results = {}
+        tasks = {}
+
+        async def run(name: str):
+            if journal and name in journal.hooks_done:
+                osworker_log.info(f'хук {name} уже выполнен в рамках {journal.run_id}, повторно не запускается')
+                self.output(f'[OK] Хук {name} уже выполнен')
+                results[name] = {**journal.hooks_done[name], 'stdout': '', 'stderr': ''}
+                return
+
+            deps = [tasks[dep] for dep in hooks[name].get('after', []) if dep in tasks]
+            await asyncio.gather(*deps)
+            failed = [dep for dep in hooks[name].get('after', []) if dep in results
+                      and results[dep]['status'] != 'ok']
+            if failed:
+                osworker_log.warning(f'хук {name} пропущен: не выполнены зависимости {", ".join(failed)}')
+                self.output(f'[✗] Хук {name} пропущен: не выполнены зависимости {", ".join(failed)}')
+                results[name] = {'status': 'skipped', 'returncode': None, 'stdout': '', 'stderr': '',
+                                 'duration': 0.0}
+            else:
+                if journal:
+                    if name in journal.hooks_begun:
+                        osworker_log.warning(f'хук {name} был прерван в рамках {journal.run_id}, запускается повторно')
+                    journal.begin_hook(name)
+                results[name] = await self._run_hook(name, hooks[name])
+
+            if journal:
+                journal.complete_hook(name, results[name])
+
+        for name in triggered:
+            tasks[name] = asyncio.create_task(run(name))
+        await asyncio.gather(*tasks.values())
+        return results
+
+    async def _run_hook(self, name: str, hook: dict) -> dict:
+        timeout = hook.get('timeout', HOOK_TIMEOUT)
+        started = time.monotonic()
+
+        try:
+            args = self.hook_args(name, hook['command'])
+            osworker_log.info(f'запуск хука {name}: {shlex.join(args)}')
+            # Собственная группа процессов: по таймауту завершается не только сам хук, но и порождённые им процессы
+            proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.PIPE, start_new_session=True)
+        except (OSError, ValueError, TypeError) as e:
+            osworker_log.error(f'хук {name} не запущен: {e}')
+            self.output(f'[✗] Хук {name} не запущен: {e}')
+            return {'status': 'failed', 'returncode': None, 'stdout': '', 'stderr': str(e),
+                    'duration': time.monotonic() - started}
+
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            stdout, stderr = await self._kill_hook(proc)
+            osworker_log.error(f'хук {name} прерван по таймауту {timeout} с')
+            self.output(f'[✗] Хук {name} прерван по таймауту {timeout} с')
+            status = 'timeout'
+        else:
+            status = 'ok' if proc.returncode == 0 else 'failed'
+            if status == 'ok':
+                osworker_log.info(f'хук {name} выполнен')
+                self.output(f'[✓] Хук {name} выполнен')
+            else:
+                osworker_log.error(f'хук {name} завершился с кодом {proc.returncode}')
+                self.output(f'[✗] Хук {name} завершился с кодом {proc.returncode}')
+
+        result = {
+            'status': status,
+            'returncode': proc.returncode,
+            'stdout': stdout.decode(errors='replace'),
+            'stderr': stderr.decode(errors='replace'),
+            'duration': time.monotonic() - started,
+        }
+        for stream in ('stdout', 'stderr'):
+            if result[stream].strip():
+                osworker_log.info(f'{stream} хука {name}:\n{result[stream].rstrip()}')
+        return result
+
+    @staticmethod
+    async def _kill_hook(proc: asyncio.subprocess.Process) -> tuple[bytes, bytes]:
+        """
+        Завершает группу процессов хука и дочитывает его вывод. Ожидание вывода ограничено KILL_DRAIN_TIMEOUT:
+        процесс, вышедший из группы (например, через setsid), может удерживать каналы сколь угодно долго.
+        """
+
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        try:
+            return await asyncio.wait_for(proc.communicate(), KILL_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            osworker_log.warning(f'вывод хука (pid {proc.pid}) не дочитан: каналы удерживает другой процесс')
+            # У asyncio.subprocess.Process нет публичного close: без закрытия транспорта каналы остаются открытыми
+            # до сборки мусора, уже после закрытия цикла событий
+            proc._transport.close()
+            return b'', b''
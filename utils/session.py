@@ -0,0 +1,158 @@
+"""
+Встраиваемый API InitCraft для работы внутри одного долгоживущего процесса.
+
+В отличие от CLI, сессия не завершает процесс и не пишет в stdout: каталог InitCraft и функция вывода
+сообщений передаются в конструктор, ошибки выбрасываются исключениями, а результаты возвращаются структурами.
+Разобранные карты конфигурации (с отпечатками их файлов) и манифест конвертера кэшируются между вызовами.
+
+Журналирование:
+- все модули InitCraft пишут в дочерние логгеры пакета `InitCraft` (`InitCraft.editor`, `InitCraft.journal` и т.д.),
+  у которых нет собственных обработчиков: записи принимает тот обработчик, который встраивающее приложение подключит
+  к логгеру `InitCraft` (или к корневому логгеру);
+- файл `InitCraft.log` подключает только точка входа CLI, импорт модулей его не открывает;
+- переданный в Session логгер заменяет логгер самой сессии (по умолчанию `InitCraft.session`).
+
+Пример:
+-------
+>>> from utils.session import Session
+>>> session = Session('/srv/initcraft')
+>>> result = session.apply('maps/base.json', 'maps/web.json', 'maps/web-01.json')
+>>> result.changed, result.hooks
+"""
+import os
+import copy
+from dataclasses import dataclass, field
+from logging import getLogger, Logger
+from constant import base_dir, utility_name
+from utils.backup import create_backup, rollback_mode
+from utils.converter import txt_to_json, load_manifest
+from utils.editor import ConfigMaker
+from utils.journal import ApplyJournal
+
+
+session_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
+
+
+class SessionError(Exception):
+    """Операцию сессии невозможно выполнить (например, нет журнала для продолжения или отмены)."""
+
+
+@dataclass
+class ApplyResult:
+    run_id: str
+    changed: list[str] = field(default_factory=list)
+    pending: list[str] = field(default_factory=list)
+    hooks: dict = field(default_factory=dict)
+    finished: bool = False
+
+
+class Session:
+    """
+    Сессия InitCraft с собственным корневым каталогом (`backup/`, `converted/`, `cache/`, `journal/`),
+    логгером и функцией вывода сообщений.
+
+    Ошибки загрузки карты выбрасываются как ConfigMapError, ошибки журнала — как SessionError.
+    Сообщения для пользователя передаются в `output`; по умолчанию они пишутся в лог сессии с уровнем DEBUG.
+    `logger` заменяет логгер самой сессии; записи модулей InitCraft идут в логгер пакета `InitCraft`
+    (см. описание модуля).
+    """
+
+    def __init__(self, base: str = base_dir, logger: Logger | None = None, output=None) -> None:
+        self.base = base
+        self.log = logger or session_log
+        self.output = output or self.log.debug
+        self._maps = {}
+        self._manifest = None
+
+    @staticmethod
+    def fingerprint(path: str) -> tuple:
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def load_map(self, *layers: str) -> dict:
+        """
+        Загружает карту конфигурации из одного или нескольких слоёв (см. ConfigMaker.merge_maps).
+        Повторный вызов с теми же неизменёнными файлами возвращает карту из кэша сессии без чтения диска.
+
+        :return: Копия карты конфигурации, которую можно свободно изменять
+        """
+
+        key = tuple(os.path.abspath(layer) for layer in layers)
+        try:
+            fingerprints = tuple(self.fingerprint(layer) for layer in key)
+        except OSError:
+            fingerprints = None
+
+        cached = self._maps.get(key)
+        if fingerprints and cached and cached[0] == fingerprints:
+            return copy.deepcopy(cached[1])
+
+        config_map = ConfigMaker(3, list(layers), self.base, self.output).config_map
+        if fingerprints:
+            self._maps[key] = (fingerprints, config_map)
+        self.log.info(f'карта конфигурации загружена в сессию: {list(layers)}')
+        return copy.deepcopy(config_map)
+
+    def apply(self, *layers: str) -> ApplyResult:
+        config_map = self.load_map(*layers)
+        config_map.pop('config_files', None)
+        journal = ApplyJournal.start(config_map, self.base)
+        return self._apply_journal(journal)
+
+    async def apply_async(self, *layers: str) -> ApplyResult:
+        """Асинхронный вариант apply для вызова из работающего event loop: хуки выполняются в текущем цикле."""
+
+        config_map = self.load_map(*layers)
+        config_map.pop('config_files', None)
+        journal = ApplyJournal.start(config_map, self.base)
+        self.log.info(f'применение карты конфигурации {journal.run_id}: {journal.pending()}')
+        hooks = await ConfigMaker.apply_journal_async(journal, self.output)
+        return self._result(journal, hooks)
+
+    def resume(self) -> ApplyResult:
+        return self._apply_journal(self._unfinished_journal())
+
+    async def resume_async(self) -> ApplyResult:
+        journal = self._unfinished_journal()
+        self.log.info(f'продолжение применения карты конфигурации {journal.run_id}: {journal.pending()}')
+        hooks = await ConfigMaker.apply_journal_async(journal, self.output)
+        return self._result(journal, hooks)
+
+    def _unfinished_journal(self) -> ApplyJournal:
+        journal = ApplyJournal.latest(self.base)
+        if not journal or journal.undone or journal.finished:
+            raise SessionError('нет прерванного применения карты конфигурации')
+        return journal
+
+    def undo(self) -> list[str]:
+        journal = ApplyJournal.latest(self.base)
+        if not journal or journal.undone:
+            raise SessionError('нет применения карты конфигурации, которое можно отменить')
+        self.log.info(f'отмена применения карты конфигурации {journal.run_id}')
+        return journal.undo(self.output)
+
+    def _apply_journal(self, journal: ApplyJournal) -> ApplyResult:
+        self.log.info(f'применение карты конфигурации {journal.run_id}: {journal.pending()}')
+        hooks = ConfigMaker.apply_journal(journal, self.output)
+        return self._result(journal, hooks)
+
+    @staticmethod
+    def _result(journal: ApplyJournal, hooks: dict) -> ApplyResult:
+        return ApplyResult(
+            run_id=journal.run_id,
+            changed=journal.changed_files(),
+            pending=journal.pending(),
+            hooks=hooks,
+            finished=journal.finished,
+        )
+
+    def backup(self, paths: list[str]) -> list[str]:
+        return create_backup(paths, self.base, self.output)
+
+    def rollback(self, paths: list[str]) -> list[str]:
+        return rollback_mode(paths, self.base, self.output)
+
+    def convert(self, patterns: list[str], exclude: list[str] | None = None) -> list[str]:
+        if self._manifest is None:
+            self._manifest = load_manifest(os.path.join(self.base, 'converted'))
+        return txt_to_json(patterns, exclude, self.base, self.output, self._manifest)
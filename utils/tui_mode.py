@@ -17,10 +17,10 @@
 Зависимости:
 ------------
 - `curses`: для создания TUI-интерфейса.
-- `ConfigMaker`: основной класс для работы с конфигурацией.
+- `ConfigMaker`, `ConfigMapError`: основной класс для работы с конфигурацией и его исключение.
 - `OSWorker`: класс для перезагрузки системы.
 - `create_backup`: функция создания резервной копии файлов.
-- `constant`: содержит глобальные константы `utility_name`, `LogSet`, `menu_items`.
+- `constant`: содержит глобальные константы `utility_name`, `menu_items`.
 
 Функции:
 --------
@@ -38,19 +38,14 @@
 """
 import os
 import curses
-from utils.editor import ConfigMaker
+from utils.editor import ConfigMaker, ConfigMapError
 from utils.os_worker import OSWorker
 from utils.backup import create_backup
 from logging import getLogger
-from constant import LogSet, utility_name, menu_items
+from constant import utility_name, menu_items
 
 
-menu_tui_log = getLogger(os.path.basename(__file__).removesuffix('.py'))
-menu_tui_log.setLevel(LogSet['level'])
-if not menu_tui_log.handlers:
-    handler = LogSet['handler']
-    handler.setFormatter(LogSet['formatter'])
-    menu_tui_log.addHandler(handler)
+menu_tui_log = getLogger(f'{utility_name}.{os.path.basename(__file__).removesuffix(".py")}')
 
 
 def draw_title(stdscr, width, cursor = 0):
@@ -127,7 +122,12 @@ def tui_main(stdscr):
                     return None
 
             elif conf_mode in {1, 2}:
-                editor = ConfigMaker(conf_mode, config_line)
+                try:
+                    editor = ConfigMaker(conf_mode, config_line)
+                except ConfigMapError as e:
+                    message = f'[ERROR] {e}'
+                    continue
+
                 if conf_mode == 1:
                     message = (f'[OK] Карта конфигурации загружена\n'
                                f'  config_files: {editor.config_map["config_files"]}')
@@ -144,7 +144,12 @@ def tui_main(stdscr):
                 path = stdscr.getstr(4, 40, 60).decode('utf-8')
                 config_line = path
                 curses.noecho()
-                editor = ConfigMaker(conf_mode, config_line)
+                try:
+                    editor = ConfigMaker(conf_mode, config_line)
+                except ConfigMapError as e:
+                    message = f'[ERROR] {e}'
+                    continue
+
                 message = f'[OK] Кастомная карта конфигурации загружена\n  {path}'
                 map_is_load = True
 
@@ -157,7 +162,12 @@ def tui_main(stdscr):
                 inline = stdscr.getstr(4, 64, 120).decode('utf-8')
                 config_line = inline
                 curses.noecho()
-                editor = ConfigMaker(conf_mode, config_line)
+                try:
+                    editor = ConfigMaker(conf_mode, config_line)
+                except ConfigMapError as e:
+                    message = f'[ERROR] {e}'
+                    continue
+
                 message = '[OK] Карта конфигурации заполнена вручную'
 
         elif key in [ord('q'), ord('Q')]: